@@ -1,5 +1,15 @@
+import base64
 import bcrypt
+import hashlib
+import hmac
+import json
 import jwt
+import re
+import time
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo.errors import OperationFailure, PyMongoError
+from redis.exceptions import RedisError
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional, Tuple
 from enum import Enum
@@ -22,39 +32,111 @@ class EventStatus(Enum):
     REJECTED = "rejected"
     CANCELLED = "cancelled"
 
+# Roles allowed to manage clubs and approve events and memberships
+PRIVILEGED_ROLES = frozenset({UserRole.FACULTY.value, UserRole.ADMIN.value})
+# Club roles allowed to approve membership requests
+OFFICER_ROLES = frozenset({'president', 'vice-president', 'secretary'})
+
+# Fields each create/register payload must provide
+USER_REQUIRED_FIELDS = frozenset({'name', 'email', 'password', 'role'})
+STUDENT_REQUIRED_FIELDS = frozenset({'studentId', 'year'})
+CLUB_REQUIRED_FIELDS = frozenset({'name', 'description', 'category', 'mission', 'vision'})
+EVENT_REQUIRED_FIELDS = frozenset({
+    'title', 'description', 'clubId', 'eventType', 'venue', 'date', 'startTime', 'endTime'
+})
+
+# Failures reported back to callers as (False, {"error": ...}); anything else
+# is a bug and propagates
+HANDLED_ERRORS = (PyMongoError, InvalidId, KeyError, ValueError)
+
+# Aggregation stage that stringifies an event's ObjectId fields server-side
+EVENT_IDS_TO_STRING = {"$addFields": {
+    "_id": {"$toString": "$_id"},
+    "clubId": {"$toString": "$clubId"},
+    "organizer": {"$toString": "$organizer"},
+    "approvedBy": {"$cond": [
+        {"$eq": [{"$type": "$approvedBy"}, "objectId"]},
+        {"$toString": "$approvedBy"},
+        "$approvedBy"
+    ]}
+}}
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
 class ClubManagementSystem:
-    def __init__(self, db_connector, redis_client, jwt_secret):
+    def __init__(self, db_connector, redis_client, jwt_secret, bcrypt_rounds=10,
+                 use_transactions=True):
         self.db = db_connector
         self.redis = redis_client
         self.jwt_secret = jwt_secret
+        # HS256 signing state shared by every token: the encoded header and a
+        # keyed HMAC that is copied per token instead of rebuilt
+        self._jwt_header = self._b64url(b'{"alg":"HS256","typ":"JWT"}')
+        self._jwt_hmac = hmac.new(
+            jwt_secret.encode('utf-8') if isinstance(jwt_secret, str) else jwt_secret,
+            digestmod=hashlib.sha256
+        )
         self.token_expiry = timedelta(hours=24)
+        # Matches the salt rounds used by the Node server (bcrypt.genSalt(10))
+        self.bcrypt_rounds = bcrypt_rounds
+        # Multi-document writes use transactions unless the server turns out to be
+        # a standalone mongod (the local dev default), which does not support them
+        self.use_transactions = use_transactions
+        self.cache_ttl = 300  # seconds
+        # Bounds how long a role changed outside this module (e.g. by the Node
+        # server) keeps passing authorization checks
+        self.role_cache_ttl = 30  # seconds
+        self.dashboard_cache_ttl = 60  # seconds
+
+    def ensure_indexes(self):
+        """Create the indexes backing the queries in this module.
+        
+        Idempotent, but not called by the constructor: run it once as a
+        startup/deploy step so conflicting data (e.g. duplicate club names)
+        surfaces there rather than on every instantiation.
+        """
+        # users.email is deliberately not unique; see server/scripts/dropEmailIndex.js
+        self.db.users.create_index("email")
+        self.db.users.create_index("studentId", sparse=True)
+        
+        self.db.clubs.create_index("name", unique=True)
+        self.db.clubs.create_index([("isActive", 1), ("category", 1)])
+        self.db.clubs.create_index("members.status")
+        self.db.clubs.create_index([("name", "text"), ("description", "text")])
+        
+        self.db.events.create_index([("status", 1), ("date", 1)])
+        self.db.events.create_index([("clubId", 1), ("date", -1)])
 
     # ==================== USER MANAGEMENT ====================
     
     def register_user(self, user_data: Dict) -> Tuple[bool, Dict]:
         """Register a new user with role-based validation"""
         try:
+            if not isinstance(user_data, dict):
+                return False, {"error": "Invalid request data"}
+            
             # Validate required fields
-            required_fields = ['name', 'email', 'password', 'role']
-            if not all(field in user_data for field in required_fields):
+            if not USER_REQUIRED_FIELDS <= user_data.keys():
                 return False, {"error": "Missing required fields"}
             
+            # Non-string values would reach Mongo as query operators or break hashing
+            if not isinstance(user_data['email'], str) or not isinstance(user_data['password'], str):
+                return False, {"error": "Invalid email or password"}
+            
             # Check for existing user
-            if self.db.users.find_one({"email": user_data['email']}):
+            if self.db.users.find_one({"email": user_data['email']}, {"_id": 1}):
                 return False, {"error": "Email already exists"}
             
             # Role-specific validation
             if user_data['role'] == UserRole.STUDENT.value:
-                if 'studentId' not in user_data or 'year' not in user_data:
+                if not STUDENT_REQUIRED_FIELDS <= user_data.keys():
                     return False, {"error": "Student ID and year required for students"}
-                if self.db.users.find_one({"studentId": user_data['studentId']}):
+                if self.db.users.find_one({"studentId": user_data['studentId']}, {"_id": 1}):
                     return False, {"error": "Student ID already exists"}
             
             # Hash password
-            hashed_password = bcrypt.hashpw(
-                user_data['password'].encode('utf-8'), 
-                bcrypt.gensalt()
-            )
+            hashed_password = self._hash_password(user_data['password'])
             
             # Create user document
             user = {
@@ -81,6 +163,7 @@ class ClubManagementSystem:
             # Save to database
             result = self.db.users.insert_one(user)
             user['_id'] = str(result.inserted_id)
+            self._cache_user_role(user)
             
             # Generate token
             token = self._generate_token(user)
@@ -91,23 +174,28 @@ class ClubManagementSystem:
                 "user": self._sanitize_user(user)
             }
             
-        except Exception as e:
+        except HANDLED_ERRORS as e:
             return False, {"error": f"Registration failed: {str(e)}"}
 
     def login_user(self, credentials: Dict) -> Tuple[bool, Dict]:
         """Authenticate user and return JWT token"""
         try:
+            # Non-string values would reach Mongo as query operators or break hashing
+            if not isinstance(credentials, dict) or not all(
+                isinstance(credentials.get(field), str) for field in ('email', 'password')
+            ):
+                return False, {"error": "Invalid credentials"}
+            
             user = self.db.users.find_one({"email": credentials['email']})
             
             if not user or not user['isActive']:
                 return False, {"error": "Invalid credentials"}
             
-            if not bcrypt.checkpw(
-                credentials['password'].encode('utf-8'),
-                user['password']
-            ):
+            if not self._check_password(credentials['password'], user['password']):
                 return False, {"error": "Invalid credentials"}
             
+            self._cache_user_role(user)
+            
             # Generate token
             token = self._generate_token(user)
             
@@ -117,27 +205,69 @@ class ClubManagementSystem:
                 "user": self._sanitize_user(user)
             }
             
-        except Exception as e:
+        except HANDLED_ERRORS as e:
             return False, {"error": f"Login failed: {str(e)}"}
 
+    def verify_token(self, token: str) -> Optional[Dict]:
+        """Validate a JWT and return its claims, caching them in Redis until expiry"""
+        if not isinstance(token, str):
+            return None
+        
+        cache_key = f"token:{hashlib.blake2b(token.encode('utf-8'), digest_size=16).hexdigest()}"
+        cached = self._cache_get(cache_key)
+        if cached:
+            return json.loads(cached)
+        
+        try:
+            # exp is required: it bounds how long the claims stay cached
+            claims = jwt.decode(
+                token, self.jwt_secret, algorithms=["HS256"], options={"require": ["exp"]}
+            )
+        except jwt.InvalidTokenError:
+            return None
+        
+        # Never cache claims beyond the token's own expiry
+        ttl = min(self.cache_ttl, int(claims['exp'] - time.time()))
+        if ttl > 0:
+            self._cache_set(cache_key, ttl, json.dumps(claims))
+        
+        return claims
+
+    def invalidate_user_role(self, user_id: str):
+        """Drop a user's cached role so the next authorization check rereads it.
+        
+        Only Python callers that change users.role can use this. Role changes
+        made by the Node server (user/role routes, server/fix-roles.js) do not
+        invalidate the cache, so there a stale role can keep passing
+        authorization checks for up to role_cache_ttl seconds.
+        """
+        self._cache_delete(f"user:role:{user_id}")
+
     def get_user_profile(self, user_id: str) -> Tuple[bool, Dict]:
         """Get user profile with populated club relationships"""
         try:
             user = self.db.users.find_one(
-                {"_id": ObjectId(user_id)},
+                {"_id": self._object_id(user_id)},
                 {"password": 0}  # Exclude password
             )
             
             if not user:
                 return False, {"error": "User not found"}
             
-            # Populate club memberships
-            clubs = []
-            for club_ref in user.get('clubs', []):
-                club = self.db.clubs.find_one(
-                    {"_id": ObjectId(club_ref['clubId'])},
+            # Populate club memberships with a single $in query
+            club_refs = user.get('clubs', [])
+            club_ids = [self._object_id(club_ref['clubId']) for club_ref in club_refs]
+            clubs_by_id = {
+                club['_id']: club
+                for club in self.db.clubs.find(
+                    {"_id": {"$in": club_ids}},
                     {"name": 1, "category": 1}
                 )
+            } if club_ids else {}
+            
+            clubs = []
+            for club_id, club_ref in zip(club_ids, club_refs):
+                club = clubs_by_id.get(club_id)
                 if club:
                     clubs.append({
                         "clubId": str(club['_id']),
@@ -151,7 +281,7 @@ class ClubManagementSystem:
             
             return True, user
             
-        except Exception as e:
+        except HANDLED_ERRORS as e:
             return False, {"error": f"Failed to get profile: {str(e)}"}
 
     # ==================== CLUB MANAGEMENT ====================
@@ -160,32 +290,36 @@ class ClubManagementSystem:
         """Create a new club with authorization checks"""
         try:
             # Get creator
-            creator = self.db.users.find_one({"_id": ObjectId(creator_id)})
-            if not creator or creator['role'] not in [UserRole.FACULTY.value, UserRole.ADMIN.value]:
+            creator_oid = self._object_id(creator_id)
+            creator = self.db.users.find_one({"_id": creator_oid}, {"role": 1})
+            if not creator or creator['role'] not in PRIVILEGED_ROLES:
                 return False, {"error": "Unauthorized to create clubs"}
             
+            if not isinstance(club_data, dict):
+                return False, {"error": "Invalid request data"}
+            
             # Validate required fields
-            required_fields = ['name', 'description', 'category', 'mission', 'vision']
-            if not all(field in club_data for field in required_fields):
+            if not CLUB_REQUIRED_FIELDS <= club_data.keys():
                 return False, {"error": "Missing required fields"}
             
             # Check for existing club
-            if self.db.clubs.find_one({"name": club_data['name']}):
+            if self.db.clubs.find_one({"name": club_data['name']}, {"_id": 1}):
                 return False, {"error": "Club name already exists"}
             
             # Create club document
+            now = datetime.utcnow()
             club = {
                 "name": club_data['name'],
                 "description": club_data['description'],
                 "category": club_data['category'],
                 "mission": club_data['mission'],
                 "vision": club_data['vision'],
-                "facultyCoordinator": ObjectId(creator_id),
-                "establishedDate": club_data.get('establishedDate', datetime.utcnow()),
+                "facultyCoordinator": creator_oid,
+                "establishedDate": club_data.get('establishedDate', now),
                 "isActive": True,
                 "members": [],
                 "events": [],
-                "createdAt": datetime.utcnow()
+                "createdAt": now
             }
             
             # Save to database
@@ -197,7 +331,7 @@ class ClubManagementSystem:
                 "type": "club-created",
                 "clubId": club['_id'],
                 "clubName": club['name'],
-                "timestamp": datetime.utcnow().isoformat()
+                "timestamp": now
             })
             
             return True, {
@@ -205,45 +339,57 @@ class ClubManagementSystem:
                 "club": club
             }
             
-        except Exception as e:
+        except HANDLED_ERRORS as e:
             return False, {"error": f"Failed to create club: {str(e)}"}
 
     def join_club(self, club_id: str, user_id: str) -> Tuple[bool, Dict]:
         """Request membership to a club"""
         try:
-            club = self.db.clubs.find_one({"_id": ObjectId(club_id)})
+            club_oid = self._object_id(club_id)
+            user_oid = self._object_id(user_id)
+            
+            # Only this user's entry of the members array is returned, if any
+            club = self.db.clubs.find_one(
+                {"_id": club_oid},
+                {"name": 1, "isActive": 1, "members": {"$elemMatch": {"userId": user_oid}}}
+            )
             if not club or not club['isActive']:
                 return False, {"error": "Club not found"}
             
             # Check if already a member
-            for member in club['members']:
-                if str(member['userId']) == user_id:
-                    return False, {"error": "Already a member of this club"}
+            if club.get('members'):
+                return False, {"error": "Already a member of this club"}
             
             # Add membership request
+            now = datetime.utcnow()
             membership = {
-                "userId": ObjectId(user_id),
+                "userId": user_oid,
                 "role": "member",
                 "status": MembershipStatus.PENDING.value,
-                "joinedAt": datetime.utcnow()
+                "joinedAt": now
             }
             
-            self.db.clubs.update_one(
-                {"_id": ObjectId(club_id)},
-                {"$push": {"members": membership}}
-            )
-            
-            # Add club to user's clubs
-            self.db.users.update_one(
-                {"_id": ObjectId(user_id)},
-                {"$push": {"clubs": {"clubId": club_id, "role": "member"}}}
-            )
-            
-            # Get user name for notification
-            user = self.db.users.find_one(
-                {"_id": ObjectId(user_id)},
-                {"name": 1}
-            )
+            # Both sides of the membership are written together; the user update
+            # also returns the name used in the notification. The club is only
+            # updated once the user is known to exist
+            def add_membership(session):
+                user = self.db.users.find_one_and_update(
+                    {"_id": user_oid},
+                    {"$push": {"clubs": {"clubId": club_id, "role": "member"}}},
+                    projection={"name": 1},
+                    session=session
+                )
+                if user:
+                    self.db.clubs.update_one(
+                        {"_id": club_oid},
+                        {"$push": {"members": membership}},
+                        session=session
+                    )
+                return user
+            
+            user = self._run_in_transaction(add_membership)
+            if not user:
+                return False, {"error": "User not found"}
             
             # Publish notification
             self._publish_notification('club-updates', {
@@ -252,18 +398,23 @@ class ClubManagementSystem:
                 "userId": user_id,
                 "clubName": club['name'],
                 "userName": user['name'],
-                "timestamp": datetime.utcnow().isoformat()
+                "timestamp": now
             })
             
             return True, {"message": "Membership request sent successfully"}
             
-        except Exception as e:
+        except HANDLED_ERRORS as e:
             return False, {"error": f"Failed to join club: {str(e)}"}
 
     def approve_membership(self, club_id: str, member_id: str, approver_id: str) -> Tuple[bool, Dict]:
         """Approve a club membership request"""
         try:
-            club = self.db.clubs.find_one({"_id": ObjectId(club_id)})
+            club_oid = self._object_id(club_id)
+            
+            club = self.db.clubs.find_one(
+                {"_id": club_oid},
+                {"members": {"$elemMatch": {"userId": self._object_id(approver_id)}}}
+            )
             if not club:
                 return False, {"error": "Club not found"}
             
@@ -271,31 +422,26 @@ class ClubManagementSystem:
             if not self._can_approve_membership(club, approver_id):
                 return False, {"error": "Insufficient permissions"}
             
-            # Find and update member
-            updated = False
-            for member in club['members']:
-                if str(member['userId']) == member_id:
-                    member['status'] = MembershipStatus.ACTIVE.value
-                    updated = True
-                    break
+            # Update only the matching member in place
+            result = self.db.clubs.update_one(
+                {"_id": club_oid, "members.userId": self._object_id(member_id)},
+                {"$set": {"members.$.status": MembershipStatus.ACTIVE.value}}
+            )
             
-            if not updated:
+            if result.matched_count == 0:
                 return False, {"error": "Member not found"}
             
-            # Save changes
-            self.db.clubs.replace_one(
-                {"_id": ObjectId(club_id)},
-                club
-            )
-            
             return True, {"message": "Membership approved successfully"}
             
-        except Exception as e:
+        except HANDLED_ERRORS as e:
             return False, {"error": f"Failed to approve membership: {str(e)}"}
 
     def get_clubs(self, filters: Dict = None) -> Tuple[bool, List]:
         """Get clubs with optional filtering"""
         try:
+            if filters is not None and not isinstance(filters, dict):
+                return False, {"error": "Invalid filters"}
+            
             query = {"isActive": True}
             
             if filters:
@@ -303,12 +449,29 @@ class ClubManagementSystem:
                     query['category'] = filters['category']
                 
                 if filters.get('search'):
-                    query['$or'] = [
-                        {"name": {"$regex": filters['search'], "$options": "i"}},
-                        {"description": {"$regex": filters['search'], "$options": "i"}}
-                    ]
+                    query['$text'] = {"$search": str(filters['search'])}
+                
+                # Keyset pagination: resume after the last _id of the previous page
+                if filters.get('after'):
+                    query['_id'] = {"$gt": self._object_id(filters['after'])}
+            
+            def find_clubs(query):
+                return list(
+                    self.db.clubs.find(query, {"members": 0, "events": 0})
+                    .sort("_id", 1)
+                    .limit(self._page_size(filters))
+                )
             
-            clubs = list(self.db.clubs.find(query))
+            try:
+                clubs = find_clubs(query)
+            except OperationFailure as e:
+                # IndexNotFound: ensure_indexes() has not been run on this database
+                if e.code != 27 or '$text' not in query:
+                    raise
+                print("Club text index missing, falling back to regex search; run ensure_indexes()")
+                del query['$text']
+                query['name'] = {"$regex": f"^{re.escape(str(filters['search']))}", "$options": "i"}
+                clubs = find_clubs(query)
             
             # Sanitize and convert IDs
             for club in clubs:
@@ -319,7 +482,7 @@ class ClubManagementSystem:
             
             return True, clubs
             
-        except Exception as e:
+        except HANDLED_ERRORS as e:
             return False, {"error": f"Failed to get clubs: {str(e)}"}
 
     # ==================== EVENT MANAGEMENT ====================
@@ -327,28 +490,50 @@ class ClubManagementSystem:
     def create_event(self, event_data: Dict, creator_id: str) -> Tuple[bool, Dict]:
         """Create a new event with authorization checks"""
         try:
+            if not isinstance(event_data, dict):
+                return False, {"error": "Invalid request data"}
+            
             # Validate required fields
-            required_fields = ['title', 'description', 'clubId', 'eventType', 'venue', 'date', 'startTime', 'endTime']
-            if not all(field in event_data for field in required_fields):
+            if not EVENT_REQUIRED_FIELDS <= event_data.keys():
                 return False, {"error": "Missing required fields"}
             
+            try:
+                event_date = datetime.strptime(event_data['date'], "%Y-%m-%d")
+            except (TypeError, ValueError):
+                return False, {"error": "Invalid event date, expected YYYY-MM-DD"}
+            
+            club_oid = self._object_id(event_data['clubId'])
+            creator_oid = self._object_id(creator_id)
+            
             # Check club exists and user has permission
-            club = self.db.clubs.find_one({"_id": ObjectId(event_data['clubId'])})
+            club = self.db.clubs.find_one(
+                {"_id": club_oid},
+                {"isActive": 1, "members": {"$elemMatch": {"userId": creator_oid}}}
+            )
             if not club or not club['isActive']:
                 return False, {"error": "Club not found"}
             
             if not self._can_create_event(club, creator_id):
                 return False, {"error": "Not authorized to create events for this club"}
             
+            # Get creator name for notification
+            creator = self.db.users.find_one(
+                {"_id": creator_oid},
+                {"name": 1}
+            )
+            if not creator:
+                return False, {"error": "User not found"}
+            
             # Create event document
+            now = datetime.utcnow()
             event = {
                 "title": event_data['title'],
                 "description": event_data['description'],
-                "clubId": ObjectId(event_data['clubId']),
-                "organizer": ObjectId(creator_id),
+                "clubId": club_oid,
+                "organizer": creator_oid,
                 "eventType": event_data['eventType'],
                 "venue": event_data['venue'],
-                "date": datetime.strptime(event_data['date'], "%Y-%m-%d"),
+                "date": event_date,
                 "startTime": event_data['startTime'],
                 "endTime": event_data['endTime'],
                 "maxParticipants": event_data.get('maxParticipants', 0),
@@ -358,7 +543,7 @@ class ClubManagementSystem:
                 },
                 "status": EventStatus.PENDING.value,
                 "registeredParticipants": [],
-                "createdAt": datetime.utcnow()
+                "createdAt": now
             }
             
             # Save to database
@@ -367,14 +552,8 @@ class ClubManagementSystem:
             
             # Add event to club
             self.db.clubs.update_one(
-                {"_id": ObjectId(event_data['clubId'])},
-                {"$push": {"events": ObjectId(result.inserted_id)}}
-            )
-            
-            # Get creator name for notification
-            creator = self.db.users.find_one(
-                {"_id": ObjectId(creator_id)},
-                {"name": 1}
+                {"_id": club_oid},
+                {"$push": {"events": result.inserted_id}}
             )
             
             # Publish notification
@@ -384,7 +563,7 @@ class ClubManagementSystem:
                 "clubId": event_data['clubId'],
                 "title": event['title'],
                 "organizer": creator['name'],
-                "timestamp": datetime.utcnow().isoformat()
+                "timestamp": now
             })
             
             return True, {
@@ -392,71 +571,86 @@ class ClubManagementSystem:
                 "event": event
             }
             
-        except Exception as e:
+        except HANDLED_ERRORS as e:
             return False, {"error": f"Failed to create event: {str(e)}"}
 
     def register_for_event(self, event_id: str, user_id: str) -> Tuple[bool, Dict]:
         """Register a user for an event"""
         try:
-            event = self.db.events.find_one({"_id": ObjectId(event_id)})
-            if not event:
-                return False, {"error": "Event not found"}
+            event_oid = self._object_id(event_id)
+            user_oid = self._object_id(user_id)
+            
+            # Duplicate and capacity checks run atomically with the push
+            result = self.db.events.update_one(
+                {
+                    "_id": event_oid,
+                    "registeredParticipants.userId": {"$ne": user_oid},
+                    "$expr": {"$or": [
+                        {"$lte": ["$maxParticipants", 0]},
+                        {"$lt": [{"$size": "$registeredParticipants"}, "$maxParticipants"]}
+                    ]}
+                },
+                {"$push": {"registeredParticipants": {
+                    "userId": user_oid,
+                    "registeredAt": datetime.utcnow()
+                }}}
+            )
             
-            # Check if already registered
-            for participant in event['registeredParticipants']:
-                if str(participant['userId']) == user_id:
+            if result.matched_count == 0:
+                # Work out why the guarded update did not apply
+                event = self.db.events.find_one(
+                    {"_id": event_oid},
+                    {"registeredParticipants": {"$elemMatch": {"userId": user_oid}}}
+                )
+                if not event:
+                    return False, {"error": "Event not found"}
+                if event.get('registeredParticipants'):
                     return False, {"error": "Already registered for this event"}
-            
-            # Check capacity
-            if event['maxParticipants'] > 0 and len(event['registeredParticipants']) >= event['maxParticipants']:
                 return False, {"error": "Event is full"}
             
-            # Add registration
-            registration = {
-                "userId": ObjectId(user_id),
-                "registeredAt": datetime.utcnow()
-            }
-            
-            self.db.events.update_one(
-                {"_id": ObjectId(event_id)},
-                {"$push": {"registeredParticipants": registration}}
-            )
-            
             return True, {"message": "Successfully registered for event"}
             
-        except Exception as e:
+        except HANDLED_ERRORS as e:
             return False, {"error": f"Failed to register for event: {str(e)}"}
 
     def approve_event(self, event_id: str, approver_data: Dict, approver_id: str) -> Tuple[bool, Dict]:
         """Approve an event (faculty/admin only)"""
         try:
-            approver = self.db.users.find_one({"_id": ObjectId(approver_id)})
-            if not approver or approver['role'] not in [UserRole.FACULTY.value, UserRole.ADMIN.value]:
+            if not isinstance(approver_data, dict):
+                return False, {"error": "Invalid request data"}
+            
+            event_oid = self._object_id(event_id)
+            approver_oid = self._object_id(approver_id)
+            
+            approver = self.db.users.find_one({"_id": approver_oid}, {"name": 1, "role": 1})
+            if not approver or approver['role'] not in PRIVILEGED_ROLES:
                 return False, {"error": "Unauthorized to approve events"}
             
-            event = self.db.events.find_one({"_id": ObjectId(event_id)})
+            event = self.db.events.find_one({"_id": event_oid}, {"title": 1, "clubId": 1})
             if not event:
                 return False, {"error": "Event not found"}
             
+            # Get club name for notification
+            club = self.db.clubs.find_one(
+                {"_id": event['clubId']},
+                {"name": 1}
+            )
+            if not club:
+                return False, {"error": "Club not found"}
+            
             # Update event
             update_data = {
                 "status": EventStatus.APPROVED.value,
-                "approvedBy": ObjectId(approver_id),
+                "approvedBy": approver_oid,
                 "approvalNotes": approver_data.get('approvalNotes', ''),
                 "budget.approved": approver_data.get('approvedBudget', 0)
             }
             
             self.db.events.update_one(
-                {"_id": ObjectId(event_id)},
+                {"_id": event_oid},
                 {"$set": update_data}
             )
             
-            # Get event details for notification
-            club = self.db.clubs.find_one(
-                {"_id": event['clubId']},
-                {"name": 1}
-            )
-            
             # Publish notification
             self._publish_notification('event-updates', {
                 "type": "event-approved",
@@ -464,17 +658,20 @@ class ClubManagementSystem:
                 "title": event['title'],
                 "clubName": club['name'],
                 "approvedBy": approver['name'],
-                "timestamp": datetime.utcnow().isoformat()
+                "timestamp": datetime.utcnow()
             })
             
             return True, {"message": "Event approved successfully"}
             
-        except Exception as e:
+        except HANDLED_ERRORS as e:
             return False, {"error": f"Failed to approve event: {str(e)}"}
 
     def get_events(self, filters: Dict = None) -> Tuple[bool, List]:
         """Get events with optional filtering"""
         try:
+            if filters is not None and not isinstance(filters, dict):
+                return False, {"error": "Invalid filters"}
+            
             query = {}
             
             if filters:
@@ -482,24 +679,27 @@ class ClubManagementSystem:
                     query['status'] = filters['status']
                 
                 if filters.get('clubId'):
-                    query['clubId'] = ObjectId(filters['clubId'])
+                    query['clubId'] = self._object_id(filters['clubId'])
                 
                 if filters.get('upcoming') == 'true':
                     query['date'] = {"$gte": datetime.utcnow()}
-            
-            events = list(self.db.events.find(query))
-            
-            # Sanitize and convert IDs
-            for event in events:
-                event['_id'] = str(event['_id'])
-                event['clubId'] = str(event['clubId'])
-                event['organizer'] = str(event['organizer'])
-                if 'approvedBy' in event and event['approvedBy']:
-                    event['approvedBy'] = str(event['approvedBy'])
+                
+                # Keyset pagination: resume after the last _id of the previous page
+                if filters.get('after'):
+                    query['_id'] = {"$gt": self._object_id(filters['after'])}
+            
+            # ObjectIds are stringified server-side instead of per document in Python
+            events = list(self.db.events.aggregate([
+                {"$match": query},
+                {"$sort": {"_id": 1}},
+                {"$limit": self._page_size(filters)},
+                {"$project": {"registeredParticipants": 0}},
+                EVENT_IDS_TO_STRING
+            ]))
             
             return True, events
             
-        except Exception as e:
+        except HANDLED_ERRORS as e:
             return False, {"error": f"Failed to get events: {str(e)}"}
 
     # ==================== DASHBOARD OPERATIONS ====================
@@ -507,96 +707,172 @@ class ClubManagementSystem:
     def get_dashboard_stats(self) -> Tuple[bool, Dict]:
         """Get dashboard statistics"""
         try:
-            # Get counts
-            total_users = self.db.users.count_documents({"isActive": True})
-            total_clubs = self.db.clubs.count_documents({"isActive": True})
-            total_events = self.db.events.count_documents()
-            pending_events = self.db.events.count_documents({"status": EventStatus.PENDING.value})
-            upcoming_events = self.db.events.count_documents({
-                "date": {"$gte": datetime.utcnow()},
-                "status": EventStatus.APPROVED.value
-            })
-            
-            # Get club distribution by category
-            pipeline = [
-                {"$match": {"isActive": True}},
-                {"$group": {"_id": "$category", "count": {"$sum": 1}}},
-                {"$sort": {"count": -1}}
-            ]
-            clubs_by_category = list(self.db.clubs.aggregate(pipeline))
+            # Counts and category distribution tolerate brief staleness
+            cached = self._cache_get("dashboard:stats")
+            if cached:
+                cached = json.loads(cached)
+                stats, clubs_by_category = cached['stats'], cached['clubsByCategory']
+            else:
+                stats, clubs_by_category = self._compute_dashboard_stats()
+                self._cache_set("dashboard:stats", self.dashboard_cache_ttl, json.dumps({
+                    "stats": stats,
+                    "clubsByCategory": clubs_by_category
+                }))
             
             # Get recent events
-            recent_events = list(self.db.events.find()
-                                 .sort("createdAt", -1)
-                                 .limit(5))
-            
-            # Sanitize event data
-            for event in recent_events:
-                event['_id'] = str(event['_id'])
-                event['clubId'] = str(event['clubId'])
-                event['organizer'] = str(event['organizer'])
+            recent_events = list(self.db.events.aggregate([
+                {"$sort": {"createdAt": -1}},
+                {"$limit": 5},
+                {"$project": {"title": 1, "clubId": 1, "organizer": 1, "status": 1, "createdAt": 1}},
+                EVENT_IDS_TO_STRING
+            ]))
             
             return True, {
-                "stats": {
-                    "totalUsers": total_users,
-                    "totalClubs": total_clubs,
-                    "totalEvents": total_events,
-                    "pendingEvents": pending_events,
-                    "upcomingEvents": upcoming_events
-                },
+                "stats": stats,
                 "clubsByCategory": clubs_by_category,
                 "recentEvents": recent_events
             }
             
-        except Exception as e:
+        except HANDLED_ERRORS as e:
             return False, {"error": f"Failed to get stats: {str(e)}"}
 
-    def get_pending_approvals(self) -> Tuple[bool, Dict]:
-        """Get all pending approvals (events and memberships)"""
+    def _compute_dashboard_stats(self) -> Tuple[Dict, List]:
+        """Compute dashboard counts with one aggregation per collection"""
+        total_users = self.db.users.count_documents({"isActive": True})
+        
+        club_facets = next(self.db.clubs.aggregate([
+            {"$match": {"isActive": True}},
+            {"$facet": {
+                "total": [{"$count": "count"}],
+                "byCategory": [
+                    {"$group": {"_id": "$category", "count": {"$sum": 1}}},
+                    {"$sort": {"count": -1}}
+                ]
+            }}
+        ]))
+        
+        event_facets = next(self.db.events.aggregate([
+            {"$facet": {
+                "total": [{"$count": "count"}],
+                "pending": [
+                    {"$match": {"status": EventStatus.PENDING.value}},
+                    {"$count": "count"}
+                ],
+                "upcoming": [
+                    {"$match": {
+                        "date": {"$gte": datetime.utcnow()},
+                        "status": EventStatus.APPROVED.value
+                    }},
+                    {"$count": "count"}
+                ]
+            }}
+        ]))
+        
+        def facet_count(facets: Dict, name: str) -> int:
+            return facets[name][0]['count'] if facets[name] else 0
+        
+        stats = {
+            "totalUsers": total_users,
+            "totalClubs": facet_count(club_facets, 'total'),
+            "totalEvents": facet_count(event_facets, 'total'),
+            "pendingEvents": facet_count(event_facets, 'pending'),
+            "upcomingEvents": facet_count(event_facets, 'upcoming')
+        }
+        return stats, club_facets['byCategory']
+
+    def get_pending_approvals(self, filters: Dict = None) -> Tuple[bool, Dict]:
+        """Get pending approvals (events and memberships), one page of each"""
         try:
-            # Get pending events
-            pending_events = list(self.db.events.find({"status": EventStatus.PENDING.value}))
-            for event in pending_events:
-                event['_id'] = str(event['_id'])
-                event['clubId'] = str(event['clubId'])
-                event['organizer'] = str(event['organizer'])
-            
-            # Get pending memberships
-            clubs_with_pending = self.db.clubs.find({
-                "members.status": MembershipStatus.PENDING.value
-            })
+            if filters is not None and not isinstance(filters, dict):
+                return False, {"error": "Invalid filters"}
+            
+            page_size = self._page_size(filters)
+            
+            # Get pending events; one extra document is fetched to detect truncation
+            event_query = {"status": EventStatus.PENDING.value}
+            if filters and filters.get('after'):
+                # Keyset pagination: resume after the last _id of the previous page
+                event_query['_id'] = {"$gt": self._object_id(filters['after'])}
+            
+            pending_events = list(self.db.events.aggregate([
+                {"$match": event_query},
+                {"$sort": {"_id": 1}},
+                {"$limit": page_size + 1},
+                {"$project": {"registeredParticipants": 0}},
+                EVENT_IDS_TO_STRING
+            ]))
+            
+            # Get pending memberships, joining each requester in a single aggregation.
+            # Requests whose user no longer exists are dropped before paging so they
+            # cannot fill a page
+            pipeline = [
+                {"$match": {"members.status": MembershipStatus.PENDING.value}},
+                {"$unwind": "$members"},
+                {"$match": {"members.status": MembershipStatus.PENDING.value}},
+                {"$lookup": {
+                    "from": "users",
+                    "localField": "members.userId",
+                    "foreignField": "_id",
+                    "as": "user",
+                    "pipeline": [{"$project": {"name": 1, "email": 1, "department": 1}}]
+                }},
+                {"$unwind": "$user"}
+            ]
             
-            pending_memberships = []
-            for club in clubs_with_pending:
-                club_id = str(club['_id'])
-                club_name = club['name']
-                
-                for member in club['members']:
-                    if member['status'] == MembershipStatus.PENDING.value:
-                        user = self.db.users.find_one(
-                            {"_id": member['userId']},
-                            {"name": 1, "email": 1, "department": 1}
-                        )
-                        
-                        if user:
-                            pending_memberships.append({
-                                "clubId": club_id,
-                                "clubName": club_name,
-                                "user": {
-                                    "id": str(user['_id']),
-                                    "name": user['name'],
-                                    "email": user['email'],
-                                    "department": user.get('department', '')
-                                },
-                                "requestDate": member['joinedAt'].isoformat()
-                            })
+            if filters and filters.get('membershipsAfter'):
+                # Keyset pagination on (joinedAt, clubId, userId), using the
+                # nextMembershipsAfter cursor of the previous page
+                joined_at, club_id, user_id = str(filters['membershipsAfter']).split('|')
+                joined_at = datetime.fromisoformat(joined_at)
+                club_oid = self._object_id(club_id)
+                pipeline.append({"$match": {"$or": [
+                    {"members.joinedAt": {"$gt": joined_at}},
+                    {"members.joinedAt": joined_at, "_id": {"$gt": club_oid}},
+                    {
+                        "members.joinedAt": joined_at,
+                        "_id": club_oid,
+                        "members.userId": {"$gt": self._object_id(user_id)}
+                    }
+                ]}})
+            
+            pipeline += [
+                {"$sort": {"members.joinedAt": 1, "_id": 1, "members.userId": 1}},
+                {"$limit": page_size + 1},
+                {"$project": {
+                    "_id": 0,
+                    "clubId": {"$toString": "$_id"},
+                    "clubName": "$name",
+                    "user": {
+                        "id": {"$toString": "$user._id"},
+                        "name": "$user.name",
+                        "email": "$user.email",
+                        "department": {"$ifNull": ["$user.department", ""]}
+                    },
+                    "requestDate": "$members.joinedAt"
+                }}
+            ]
+            
+            pending_memberships = list(self.db.clubs.aggregate(pipeline))
+            for membership in pending_memberships:
+                membership['requestDate'] = membership['requestDate'].isoformat()
+            
+            memberships_truncated = len(pending_memberships) > page_size
+            pending_memberships = pending_memberships[:page_size]
+            next_memberships_after = None
+            if memberships_truncated:
+                last = pending_memberships[-1]
+                next_memberships_after = f"{last['requestDate']}|{last['clubId']}|{last['user']['id']}"
             
+            # Oldest requests come first
             return True, {
-                "pendingEvents": pending_events,
-                "pendingMemberships": pending_memberships
+                "pendingEvents": pending_events[:page_size],
+                "pendingEventsTruncated": len(pending_events) > page_size,
+                "pendingMemberships": pending_memberships,
+                "pendingMembershipsTruncated": memberships_truncated,
+                "nextMembershipsAfter": next_memberships_after
             }
             
-        except Exception as e:
+        except HANDLED_ERRORS as e:
             return False, {"error": f"Failed to get pending approvals: {str(e)}"}
 
     # ==================== HELPER METHODS ====================
@@ -607,9 +883,60 @@ class ClubManagementSystem:
             "id": str(user['_id']),
             "email": user['email'],
             "role": user['role'],
-            "exp": datetime.utcnow() + self.token_expiry
+            "exp": int(time.time() + self.token_expiry.total_seconds())
         }
-        return jwt.encode(payload, self.jwt_secret, algorithm="HS256")
+        body = self._b64url(json.dumps(payload, separators=(',', ':')).encode('utf-8'))
+        signing_input = f"{self._jwt_header}.{body}"
+        signer = self._jwt_hmac.copy()
+        signer.update(signing_input.encode('ascii'))
+        return f"{signing_input}.{self._b64url(signer.digest())}"
+    
+    @staticmethod
+    def _b64url(data: bytes) -> str:
+        """Base64url-encode without padding, as JWT segments require"""
+        return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+    
+    def _hash_password(self, password: str) -> bytes:
+        """Hash a password with bcrypt"""
+        # bcrypt releases the GIL, so concurrent request threads already hash in parallel
+        return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=self.bcrypt_rounds))
+    
+    def _check_password(self, password: str, hashed_password) -> bool:
+        """Verify a password against its bcrypt hash"""
+        # Hashes written by the Node server come back from Mongo as str
+        if isinstance(hashed_password, str):
+            hashed_password = hashed_password.encode('utf-8')
+        return bcrypt.checkpw(password.encode('utf-8'), hashed_password)
+    
+    def _run_in_transaction(self, callback):
+        """Run callback(session) in a transaction, or as plain ordered writes
+        (session=None) when the server does not support transactions"""
+        if self.use_transactions:
+            try:
+                with self.db.client.start_session() as session:
+                    return session.with_transaction(callback)
+            except OperationFailure as e:
+                # IllegalOperation: transactions need a replica set or mongos
+                if e.code != 20:
+                    raise
+                print("Transactions unsupported by this MongoDB server, using ordered writes")
+                self.use_transactions = False
+        return callback(None)
+    
+    def _page_size(self, filters: Optional[Dict]) -> int:
+        """Get the requested page size, clamped to MAX_PAGE_SIZE"""
+        if not filters or not filters.get('pageSize'):
+            return DEFAULT_PAGE_SIZE
+        if not isinstance(filters['pageSize'], (int, str)):
+            raise ValueError("pageSize must be a number")
+        return max(1, min(int(filters['pageSize']), MAX_PAGE_SIZE))
+    
+    @staticmethod
+    def _object_id(value) -> ObjectId:
+        """Parse an id from client input; anything but a str or ObjectId is an InvalidId"""
+        if not isinstance(value, (str, ObjectId)):
+            raise InvalidId(f"{value!r} is not a valid ObjectId")
+        return ObjectId(value)
     
     def _sanitize_user(self, user: Dict) -> Dict:
         """Remove sensitive fields from user object"""
@@ -618,17 +945,35 @@ class ClubManagementSystem:
         sanitized['_id'] = str(sanitized['_id'])
         return sanitized
     
+    def _get_user_role(self, user_id: str) -> Optional[str]:
+        """Get a user's role, served from Redis when cached"""
+        # Roles are deliberately not cached in-process: only the shared Redis
+        # entry can be revoked by invalidate_user_role
+        role = self._cache_get(f"user:role:{user_id}")
+        if role:
+            return role.decode('utf-8') if isinstance(role, bytes) else role
+        
+        user = self.db.users.find_one({"_id": self._object_id(user_id)}, {"role": 1})
+        if not user:
+            return None
+        
+        self._cache_user_role(user)
+        return user['role']
+    
+    def _cache_user_role(self, user: Dict):
+        """Cache a user's role in Redis"""
+        self._cache_set(f"user:role:{user['_id']}", self.role_cache_ttl, user['role'])
+    
     def _can_approve_membership(self, club: Dict, user_id: str) -> bool:
         """Check if user can approve memberships for a club"""
         # Check if user is faculty/admin
-        user = self.db.users.find_one({"_id": ObjectId(user_id)})
-        if user and user['role'] in [UserRole.FACULTY.value, UserRole.ADMIN.value]:
+        if self._get_user_role(user_id) in PRIVILEGED_ROLES:
             return True
         
         # Check if user is a club officer
-        for member in club['members']:
+        for member in club.get('members', []):
             if str(member['userId']) == user_id and member['status'] == MembershipStatus.ACTIVE.value:
-                if member['role'] in ['president', 'vice-president', 'secretary']:
+                if member['role'] in OFFICER_ROLES:
                     return True
         
         return False
@@ -636,20 +981,48 @@ class ClubManagementSystem:
     def _can_create_event(self, club: Dict, user_id: str) -> bool:
         """Check if user can create events for a club"""
         # Check if user is faculty/admin
-        user = self.db.users.find_one({"_id": ObjectId(user_id)})
-        if user and user['role'] in [UserRole.FACULTY.value, UserRole.ADMIN.value]:
+        if self._get_user_role(user_id) in PRIVILEGED_ROLES:
             return True
         
         # Check if user is an active club member
-        for member in club['members']:
+        for member in club.get('members', []):
             if str(member['userId']) == user_id and member['status'] == MembershipStatus.ACTIVE.value:
                 return True
         
         return False
     
+    def _cache_get(self, key: str):
+        """Read a cached value from Redis, treating failures as cache misses"""
+        try:
+            return self.redis.get(key)
+        except RedisError as e:
+            print(f"Failed to read cache: {str(e)}")
+            return None
+    
+    def _cache_set(self, key: str, ttl: int, value: str):
+        """Write a value to Redis with a TTL, ignoring failures"""
+        try:
+            self.redis.setex(key, ttl, value)
+        except RedisError as e:
+            print(f"Failed to write cache: {str(e)}")
+    
+    def _cache_delete(self, key: str):
+        """Delete a cached value from Redis, ignoring failures"""
+        try:
+            self.redis.delete(key)
+        except RedisError as e:
+            print(f"Failed to delete cache: {str(e)}")
+    
+    @staticmethod
+    def _json_default(value):
+        """Serialize values json cannot encode natively (datetimes, ObjectIds)"""
+        if isinstance(value, datetime):
+            return value.isoformat()
+        return str(value)
+    
     def _publish_notification(self, channel: str, message: Dict):
         """Publish notification to Redis channel"""
         try:
-            self.redis.publish(channel, str(message).replace("'", '"'))
-        except Exception as e:
+            self.redis.publish(channel, json.dumps(message, default=self._json_default))
+        except RedisError as e:
             print(f"Failed to publish notification: {str(e)}")
\ No newline at end of file
@@ -0,0 +1,181 @@
+"""Unit tests for ClubManagementSystem that run without MongoDB or Redis.
+
+    python -m pytest test_business_logic.py
+"""
+import unittest
+from unittest import mock
+import jwt
+from datetime import datetime
+from bson import ObjectId
+from pymongo.errors import OperationFailure
+from business_logic import ClubManagementSystem
+
+
+class TestTokenGeneration(unittest.TestCase):
+
+    SECRET = "test-secret"
+    USER = {
+        "_id": "64b7f0c2e4b0a1a2b3c4d5e6",
+        "email": "admin@kmit.in",
+        "role": "admin"
+    }
+
+    def setUp(self):
+        # Token helpers never touch Mongo; Redis always misses
+        redis_client = mock.Mock()
+        redis_client.get.return_value = None
+        self.system = ClubManagementSystem(None, redis_client, self.SECRET)
+
+    def test_matches_pyjwt(self):
+        """The hand-rolled HS256 token is byte-identical to jwt.encode"""
+        now = 1700000000.5
+        with mock.patch("business_logic.time.time", return_value=now):
+            token = self.system._generate_token(self.USER)
+
+        expected = jwt.encode({
+            "id": self.USER["_id"],
+            "email": self.USER["email"],
+            "role": self.USER["role"],
+            "exp": int(now + self.system.token_expiry.total_seconds())
+        }, self.SECRET, algorithm="HS256")
+        self.assertEqual(token, expected)
+
+    def test_round_trips_through_verify_token(self):
+        """verify_token accepts a generated token and returns its claims"""
+        token = self.system._generate_token(self.USER)
+        claims = self.system.verify_token(token)
+
+        self.assertIsNotNone(claims)
+        self.assertEqual(claims["id"], self.USER["_id"])
+        self.assertEqual(claims["email"], self.USER["email"])
+        self.assertEqual(claims["role"], self.USER["role"])
+
+    def test_rejects_wrong_secret(self):
+        """A token signed with another secret does not verify"""
+        other = ClubManagementSystem(None, self.system.redis, "other-secret")
+        self.assertIsNone(self.system.verify_token(other._generate_token(self.USER)))
+
+    def test_rejects_token_without_exp(self):
+        """A correctly signed token with no exp claim does not verify"""
+        token = jwt.encode({"id": self.USER["_id"]}, self.SECRET, algorithm="HS256")
+        self.assertIsNone(self.system.verify_token(token))
+
+
+
+class TestClubSearch(unittest.TestCase):
+
+    CLUB = {
+        "_id": ObjectId("64b7f0c2e4b0a1a2b3c4d5e7"),
+        "name": "Coding Club",
+        "facultyCoordinator": ObjectId("64b7f0c2e4b0a1a2b3c4d5e6")
+    }
+
+    def setUp(self):
+        self.db = mock.MagicMock()
+        self.system = ClubManagementSystem(self.db, mock.Mock(), "test-secret")
+
+    def test_search_without_text_index(self):
+        """Search falls back to an escaped, anchored regex when the text index is missing"""
+        def find(query, projection):
+            if "$text" in query:
+                raise OperationFailure("text index required for $text query", code=27)
+            cursor = mock.MagicMock()
+            cursor.sort.return_value.limit.return_value = [dict(self.CLUB)]
+            return cursor
+        self.db.clubs.find.side_effect = find
+
+        success, clubs = self.system.get_clubs({"search": "Coding (C++)"})
+
+        self.assertTrue(success)
+        self.assertEqual([club["name"] for club in clubs], ["Coding Club"])
+        fallback_query = self.db.clubs.find.call_args[0][0]
+        self.assertEqual(fallback_query["name"], {"$regex": r"^Coding\ \(C\+\+\)", "$options": "i"})
+        self.assertNotIn("$text", fallback_query)
+
+
+
+class TestPendingApprovals(unittest.TestCase):
+
+    def setUp(self):
+        self.db = mock.MagicMock()
+        self.db.events.aggregate.return_value = []
+        self.system = ClubManagementSystem(self.db, mock.Mock(), "test-secret")
+
+    def membership(self, minute):
+        return {
+            "clubId": "64b7f0c2e4b0a1a2b3c4d5e7",
+            "clubName": "Coding Club",
+            "user": {"id": f"64b7f0c2e4b0a1a2b3c4d5{minute:02d}"},
+            "requestDate": datetime(2024, 5, 1, 10, minute)
+        }
+
+    def test_memberships_page_after_dropping_orphans(self):
+        """Requests without a user are dropped before $limit, and a cursor is returned"""
+        self.db.clubs.aggregate.return_value = [self.membership(m) for m in range(3)]
+
+        success, result = self.system.get_pending_approvals({"pageSize": 2})
+
+        self.assertTrue(success)
+        self.assertEqual(len(result["pendingMemberships"]), 2)
+        self.assertTrue(result["pendingMembershipsTruncated"])
+        self.assertEqual(
+            result["nextMembershipsAfter"],
+            "2024-05-01T10:01:00|64b7f0c2e4b0a1a2b3c4d5e7|64b7f0c2e4b0a1a2b3c4d501"
+        )
+
+        stages = [next(iter(stage)) for stage in self.db.clubs.aggregate.call_args[0][0]]
+        self.assertLess(stages.index("$lookup"), stages.index("$limit"))
+
+    def test_memberships_resume_from_cursor(self):
+        """membershipsAfter adds a keyset $match ahead of $sort"""
+        self.db.clubs.aggregate.return_value = []
+
+        success, result = self.system.get_pending_approvals({
+            "membershipsAfter": "2024-05-01T10:01:00|64b7f0c2e4b0a1a2b3c4d5e7|64b7f0c2e4b0a1a2b3c4d501"
+        })
+
+        self.assertTrue(success)
+        self.assertIsNone(result["nextMembershipsAfter"])
+        pipeline = self.db.clubs.aggregate.call_args[0][0]
+        keyset = next(stage["$match"]["$or"] for stage in pipeline
+                      if "$match" in stage and "$or" in stage["$match"])
+        self.assertEqual(keyset[0], {"members.joinedAt": {"$gt": datetime(2024, 5, 1, 10, 1)}})
+
+
+
+class TestInputValidation(unittest.TestCase):
+
+    def setUp(self):
+        self.db = mock.MagicMock()
+        self.system = ClubManagementSystem(self.db, mock.Mock(), "test-secret")
+
+    def test_numeric_club_id(self):
+        """A non-string id is reported as an error instead of raising TypeError"""
+        success, result = self.system.create_event({
+            "title": "Hackathon", "description": "24h", "clubId": 123,
+            "eventType": "technical", "venue": "Lab 1", "date": "2024-05-01",
+            "startTime": "10:00", "endTime": "18:00"
+        }, "64b7f0c2e4b0a1a2b3c4d5e6")
+
+        self.assertFalse(success)
+        self.assertIn("error", result)
+
+    def test_missing_approver_data(self):
+        """approve_event rejects a non-dict payload instead of raising AttributeError"""
+        success, result = self.system.approve_event(
+            "64b7f0c2e4b0a1a2b3c4d5e7", None, "64b7f0c2e4b0a1a2b3c4d5e6"
+        )
+
+        self.assertFalse(success)
+        self.assertEqual(result, {"error": "Invalid request data"})
+
+    def test_operator_as_login_email(self):
+        """Query operators are never passed through as the login email"""
+        success, _ = self.system.login_user({"email": {"$ne": ""}, "password": "x"})
+
+        self.assertFalse(success)
+        self.db.users.find_one.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()